@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from datetime import datetime
+import plotly.graph_objects as go
+from plotly.colors import qualitative
 import joblib
+import json
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
 import re
+import http.client
+import urllib.request
+from collections import Counter
+from itertools import cycle
 from streamlit_lottie import st_lottie
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
 # --- App Configuration ---
 st.set_page_config(
@@ -20,23 +28,59 @@ st.set_page_config(
 def load_resources():
     model = joblib.load("models/emotion_model.pkl")
     vectorizer = joblib.load("models/tfidf_vectorizer.pkl")
+    # Score in float32: halves the weights read per predict and keeps the
+    # sparse-dense product from upcasting coef_ on every call. Fortran order
+    # makes coef_.T C-contiguous, so scipy can use it without copying.
+    model.coef_ = np.asfortranarray(model.coef_, dtype=np.float32)
+    model.intercept_ = model.intercept_.astype(np.float32)
+    vectorizer.idf_ = vectorizer.idf_.astype(np.float32)
     return model, vectorizer
 
 model, vectorizer = load_resources()
 
 # --- Lottie Animations ---
-def load_lottie(url):
+def _fetch_lottie(url):
+    with urllib.request.urlopen(url, timeout=3) as r:
+        if r.status != 200:
+            raise ValueError(f"Unexpected status {r.status} for {url}")
+        return json.load(r)
+
+# Failed fetches raise out of here, so they are retried on the next rerun
+# instead of being cached for the whole ttl
+@st.cache_data(ttl=86400, show_spinner=False)
+def load_lotties(urls):
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        return list(executor.map(_fetch_lottie, urls))
+
+@st.cache_resource
+def _read_lottie(path):
+    with open(path) as f:
+        return json.load(f)
+
+def load_lottie(path):
+    # Misses raise out of the cached reader, so a file added later is picked up
     try:
-        r = requests.get(url)
-        if r.status_code == 200:
-            return r.json()
-    except:
+        return _read_lottie(path)
+    except (OSError, ValueError):
         return None
-    return None
 
-# Using reliable LottieFiles URLs
-lottie_celebrate = load_lottie("https://assets1.lottiefiles.com/packages/lf20_vyL7qy.json")
-lottie_analytics = load_lottie("https://assets9.lottiefiles.com/packages/lf20_2glqweqs.json")
+# LottieFiles animations, read from a vendored copy under app/assets when one
+# has been added there and fetched from the URL otherwise
+LOTTIE_ASSETS = (
+    ("app/assets/celebrate.json", "https://assets1.lottiefiles.com/packages/lf20_vyL7qy.json"),
+    ("app/assets/analytics.json", "https://assets9.lottiefiles.com/packages/lf20_2glqweqs.json"),
+)
+
+lotties = [load_lottie(path) for path, _ in LOTTIE_ASSETS]
+missing = [i for i, lottie in enumerate(lotties) if lottie is None]
+if missing:
+    try:
+        fetched = load_lotties(tuple(LOTTIE_ASSETS[i][1] for i in missing))
+    except (OSError, ValueError, http.client.HTTPException):
+        fetched = [None] * len(missing)
+    for i, lottie in zip(missing, fetched):
+        lotties[i] = lottie
+lottie_celebrate, lottie_analytics = lotties
 
 # --- Emotion Configuration ---
 EMOTION_COLORS = {
@@ -46,6 +90,35 @@ EMOTION_COLORS = {
     'neutral': '#B8B8B8'
 }
 
+_NONALPHA_RE = re.compile(r'[^a-zA-Z\s]')
+_SENTENCE_RE = re.compile(r'[.!?]+')
+
+# NLTK's English stopword list, as used when the model was trained
+_STOPWORDS = frozenset({
+    "i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you",
+    "you're", "you've", "you'll", "you'd", "your", "yours", "yourself",
+    "yourselves", "he", "him", "his", "himself", "she", "she's", "her",
+    "hers", "herself", "it", "it's", "its", "itself", "they", "them",
+    "their", "theirs", "themselves", "what", "which", "who", "whom", "this",
+    "that", "that'll", "these", "those", "am", "is", "are", "was", "were",
+    "be", "been", "being", "have", "has", "had", "having", "do", "does",
+    "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because",
+    "as", "until", "while", "of", "at", "by", "for", "with", "about",
+    "against", "between", "into", "through", "during", "before", "after",
+    "above", "below", "to", "from", "up", "down", "in", "out", "on", "off",
+    "over", "under", "again", "further", "then", "once", "here", "there",
+    "when", "where", "why", "how", "all", "any", "both", "each", "few",
+    "more", "most", "other", "some", "such", "no", "nor", "not", "only",
+    "own", "same", "so", "than", "too", "very", "s", "t", "can", "will",
+    "just", "don", "don't", "should", "should've", "now", "d", "ll", "m",
+    "o", "re", "ve", "y", "ain", "aren", "aren't", "couldn", "couldn't",
+    "didn", "didn't", "doesn", "doesn't", "hadn", "hadn't", "hasn",
+    "hasn't", "haven", "haven't", "isn", "isn't", "ma", "mightn",
+    "mightn't", "mustn", "mustn't", "needn", "needn't", "shan", "shan't",
+    "shouldn", "shouldn't", "wasn", "wasn't", "weren", "weren't", "won",
+    "won't", "wouldn", "wouldn't"
+})
+
 label_map = {
     0: 'admiration', 1: 'amusement', 2: 'anger', 3: 'annoyance', 4: 'approval',
     5: 'caring', 6: 'confusion', 7: 'curiosity', 8: 'desire', 9: 'disappointment',
@@ -57,38 +130,48 @@ label_map = {
 
 # --- Text Processing ---
 def clean_text(text):
-    import nltk
-    from nltk.corpus import stopwords
-    
-    try:
-        stop_words = set(stopwords.words("english"))
-    except LookupError:
-        nltk.download("stopwords")
-        stop_words = set(stopwords.words("english"))
-
     text = text.lower()
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
+    text = _NONALPHA_RE.sub('', text)
     tokens = text.split()
-    filtered = [word for word in tokens if word not in stop_words]
+    filtered = [word for word in tokens if word not in _STOPWORDS]
     return ' '.join(filtered)
 
+def vectorize(docs):
+    # Same output as vectorizer.transform for clean_text output, which is
+    # already lowercased, letters-only and whitespace separated
+    vocab = vectorizer.vocabulary_
+    indices, counts, indptr = [], [], [0]
+    for doc in docs:
+        term_counts = Counter(vocab[t] for t in doc.split() if t in vocab)
+        indices.extend(term_counts)
+        counts.extend(term_counts.values())
+        indptr.append(len(indices))
+
+    data = np.asarray(counts, dtype=np.float32) * vectorizer.idf_[indices]
+    X = csr_matrix((data, indices, indptr), shape=(len(docs), len(vocab)))
+    return normalize(X, copy=False)
+
+@st.cache_data(max_entries=256, ttl=3600, show_spinner=False)
+def predict_emotion(text):
+    # The whole entry decides the headline emotion; its sentences are scored
+    # in the same batch only to build the per-sentence breakdown
+    sentences = [s for s in _SENTENCE_RE.split(text) if s.strip()] or [text]
+    vectorized = vectorize([clean_text(s) for s in [text, *sentences]])
+    # Same scores as model.decision_function without sklearn's per-call input
+    # validation; classes_ already holds the emotion names
+    scores = vectorized @ model.coef_.T + model.intercept_
+    emotion, *sentence_emotions = (str(model.classes_[idx]) for idx in scores.argmax(axis=1))
+    return emotion, dict(Counter(sentence_emotions).most_common())
+
 # --- UI Components ---
+_CARD_TPL = (
+    '<div class="emotion-card" style="background: {color};">'
+    '<h2>{emotion}</h2>'
+    '</div>'
+)
+
 def emotion_card(emotion):
-    color = EMOTION_COLORS.get(emotion, '#073B4C')
-    return f"""
-        <div style="
-            background: {color};
-            border-radius: 16px;
-            padding: 20px;
-            color: white;
-            text-align: center;
-            margin: 10px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-            animation: pulse 2s infinite;
-        ">
-            <h2 style="margin:0; font-size: 2.5rem;">{emotion.upper()}</h2>
-        </div>
-    """
+    return _CARD_TPL.format(color=EMOTION_COLORS.get(emotion, '#073B4C'), emotion=emotion.upper())
 
 # --- App Layout ---
 with st.container():
@@ -127,26 +210,26 @@ if analyze_btn:
         st.warning("📣 Write something to analyze!")
     else:
         with st.spinner("🧠 Reading between the lines..."):
-            cleaned = clean_text(journal)
-            vectorized = vectorizer.transform([cleaned])
-            prediction = model.predict(vectorized)[0]
-            emotion = prediction
+            emotion, breakdown = predict_emotion(journal)
 
         # Store in session
-        if 'history' not in st.session_state:
-            st.session_state.history = []
-        
-        st.session_state.history.append({
-            "date": datetime.now().date(),
-            "entry": journal,
-            "emotion": emotion
-        })
+        if 'history_df' not in st.session_state:
+            st.session_state.history_df = pd.DataFrame(
+                columns=['date', 'entry', 'emotion']
+            ).astype({'date': 'datetime64[ns]'})
+
+        history_df = st.session_state.history_df
+        history_df.loc[len(history_df)] = [pd.Timestamp.now().normalize(), journal, emotion]
 
         st.success("✅ Analysis complete!")
         st.balloons()
         
         # Emotion display
         st.markdown(emotion_card(emotion), unsafe_allow_html=True)
+        if len(breakdown) > 1:
+            st.caption("Across your sentences: " + " • ".join(
+                f"{name} ×{count}" for name, count in breakdown.items()
+            ))
         
         # Personalized tips
         TIPS = {
@@ -164,61 +247,66 @@ if analyze_btn:
         tip = TIPS.get(emotion, "💖 You're doing great just by checking in with yourself")
         with st.expander(f"💡 Personalized Tip for {emotion}"):
             st.info(tip)
-            if emotion in ['sadness', 'grief', 'anger', 'despair']:
+            if any(e in ['sadness', 'grief', 'anger', 'despair'] for e in [emotion, *breakdown]):
                 st.link_button("📞 Crisis Resources", "https://www.thelivelovelaughfoundation.org/find-help/helplines")
 
 # --- History Visualization ---
-if 'history' in st.session_state and st.session_state.history:
-    st.divider()
-    st.subheader("📊 Your Emotional Journey")
+@st.fragment
+def render_history():
+    if 'history_df' in st.session_state and not st.session_state.history_df.empty:
+        st.divider()
+        st.subheader("📊 Your Emotional Journey")
     
-    with st.expander("See Full History"):
-        df = pd.DataFrame(st.session_state.history)
-        df['date'] = pd.to_datetime(df['date'])
+        if st.toggle("See Full History", key="show_history"):
+            df = st.session_state.history_df
         
-        # Interactive Plotly chart
-        fig = px.scatter(
-            df,
-            x='date',
-            y='emotion',
-            color='emotion',
-            color_discrete_map=EMOTION_COLORS,
-            size=[40]*len(df),
-            hover_name='emotion',
-            hover_data={'date': True, 'emotion': False},
-            template='plotly_white'
-        )
+            # Emotions without a configured color get the default Plotly palette
+            unseen = [e for e in df['emotion'].unique() if e not in EMOTION_COLORS]
+            color_map = {**dict(zip(unseen, cycle(qualitative.Plotly))), **EMOTION_COLORS}
         
-        fig.update_layout(
-            yaxis_title="",
-            xaxis_title="",
-            showlegend=False,
-            height=400,
-            plot_bgcolor='rgba(0,0,0,0.03)',
-            margin=dict(l=0, r=0, t=40, b=0)
-        )
+            # Interactive Plotly chart
+            fig = go.Figure(go.Scattergl(
+                x=df['date'],
+                y=df['emotion'],
+                mode='markers',
+                marker=dict(
+                    color=df['emotion'].map(color_map),
+                    size=20,
+                    line=dict(width=2, color='DarkSlateGrey')
+                ),
+                hovertemplate='<b>%{y}</b><br>date=%{x}<extra></extra>'
+            ))
         
-        fig.update_traces(marker=dict(line=dict(width=2, color='DarkSlateGrey')))
-        st.plotly_chart(fig, use_container_width=True)
+            fig.update_layout(
+                template='plotly_white',
+                yaxis_title="",
+                xaxis_title="",
+                showlegend=False,
+                height=400,
+                plot_bgcolor='rgba(0,0,0,0.03)',
+                margin=dict(l=0, r=0, t=40, b=0)
+            )
         
-        # Emotion distribution pie chart
-        st.subheader("😌 Your Emotional Palette")
-        emotion_counts = df['emotion'].value_counts().reset_index()
-        emotion_counts.columns = ['emotion', 'count']
+            st.plotly_chart(fig, use_container_width=True)
         
-        pie = px.pie(
-            emotion_counts,
-            names='emotion',
-            values='count',
-            color='emotion',
-            color_discrete_map=EMOTION_COLORS,
-            hole=0.4
-        )
-        pie.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(pie, use_container_width=True)
+            # Emotion distribution pie chart
+            st.subheader("😌 Your Emotional Palette")
+            emotion_counts = df['emotion'].value_counts().rename_axis('emotion').reset_index(name='count')
         
-        # Raw data table
-        st.dataframe(df.sort_values('date', ascending=False), hide_index=True)
+            pie = go.Figure(go.Pie(
+                labels=emotion_counts['emotion'],
+                values=emotion_counts['count'],
+                marker=dict(colors=emotion_counts['emotion'].map(color_map)),
+                hole=0.4,
+                textposition='inside',
+                textinfo='percent+label'
+            ))
+            st.plotly_chart(pie, use_container_width=True)
+        
+            # Raw data table
+            st.dataframe(df.sort_values('date', ascending=False), hide_index=True)
+
+render_history()
 
 # --- Sidebar & Footer ---
 st.sidebar.header("About MHEDA")
@@ -234,49 +322,9 @@ st.sidebar.caption("Made with ❤️ in India")
 st.sidebar.caption("v1.0 • [Privacy Policy](https://example.com)")
 
 # --- CSS Styling ---
-st.markdown("""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Comfortaa:wght@700&family=Nunito:wght@400;600;800&display=swap');
-        
-        body {
-            font-family: 'Nunito', sans-serif;
-            background-color: #fafafa;
-        }
-        
-        h1, h2, h3 {
-            font-family: 'Comfortaa', cursive;
-            color: #5e17eb;
-        }
-        
-        .stButton>button {
-            background: linear-gradient(135deg, #6e8efb, #a777e3);
-            border-radius: 12px;
-            color: white;
-            font-weight: 800;
-            padding: 10px 24px;
-            transition: all 0.3s;
-        }
-        
-        .stButton>button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 12px rgba(110, 142, 251, 0.25);
-        }
-        
-        .stTextArea textarea {
-            border-radius: 16px !important;
-            padding: 16px !important;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.05) !important;
-        }
-        
-        @keyframes pulse {
-            0% { transform: scale(1); }
-            50% { transform: scale(1.02); }
-            100% { transform: scale(1); }
-        }
-        
-        .st-emotion-cache-1v0mbdj img {
-            border-radius: 16px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        }
-    </style>
-""", unsafe_allow_html=True)
\ No newline at end of file
+@st.cache_resource
+def load_css(path):
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css("app/assets/mheda.css"), unsafe_allow_html=True)